@@ -0,0 +1,237 @@
+"""
+Per-upstream circuit breakers with stale-while-revalidate fallback.
+
+Each external API (ClinicalTrials.gov, CourtListener) gets its own breaker.
+Errors and slow calls inside a rolling window trip the breaker open; while
+open, calls fail fast instead of waiting out the full HTTP timeout and the
+last good result for the same key is served marked as stale. Once the reset
+timeout passes the breaker goes half-open and a single probe revalidates the
+cached entry in the background, closing the breaker if the upstream is back.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+FailurePredicate = Callable[[Exception], bool]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Breaker is open and there is no cached result to fall back on."""
+
+
+def _always_failure(e: Exception) -> bool:
+    return True
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 4,
+        window_seconds: float = 60.0,
+        slow_call_seconds: float = 10.0,
+        reset_timeout: float = 30.0,
+        cache_size: int = 256,
+        cache_max_age: float = 24 * 3600.0,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.cache_size = cache_size
+        self.cache_max_age = cache_max_age
+
+        self.state = CLOSED
+        self.last_error: Optional[str] = None
+        self._opened_at = 0.0
+        self._opened_at_iso: Optional[str] = None
+        self._outcomes: deque = deque()  # (monotonic timestamp, ok)
+        self._probe_in_flight = False
+        self._cache: OrderedDict = OrderedDict()  # key -> (value, monotonic stored, iso stored)
+        self._revalidating: dict = {}  # key -> asyncio.Task
+
+    # ── State ────────────────────────────────────────────────────────────
+
+    def _current_state(self) -> str:
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        return self.state
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._opened_at_iso = _now_iso()
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _record(self, ok: bool, probe: bool):
+        if probe:
+            if ok:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._opened_at_iso = None
+            else:
+                self._trip()
+            return
+        if self.state != CLOSED:
+            # Late result from a call started before the breaker tripped.
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._prune(now)
+        calls = len(self._outcomes)
+        failures = sum(1 for _, success in self._outcomes if not success)
+        if calls >= self.min_calls and failures / calls >= self.failure_rate:
+            self._trip()
+
+    # ── Cache ────────────────────────────────────────────────────────────
+
+    def _store(self, key: Hashable, value: Any) -> str:
+        stored_at = _now_iso()
+        self._cache[key] = (value, time.monotonic(), stored_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return stored_at
+
+    def _cached(self, key: Hashable):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.cache_max_age:
+            del self._cache[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _stale(entry) -> tuple[Any, dict]:
+        value, _, stored_at = entry
+        return value, {"stale": True, "cached_at": stored_at}
+
+    # ── Calls ────────────────────────────────────────────────────────────
+
+    async def _attempt(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], probe: bool,
+                       is_failure: FailurePredicate) -> tuple[Any, dict]:
+        start = time.monotonic()
+        try:
+            value = await fetch()
+        except Exception as e:
+            if is_failure(e):
+                self.last_error = str(e) or type(e).__name__
+                self._record(False, probe)
+            else:
+                # Upstream answered (e.g. rejected bad caller input) — it is healthy.
+                self._record(True, probe)
+            raise
+        finally:
+            if probe:
+                self._probe_in_flight = False
+        latency = time.monotonic() - start
+        if latency > self.slow_call_seconds:
+            self.last_error = f"slow response ({latency:.1f}s)"
+            self._record(False, probe)
+        else:
+            self._record(True, probe)
+        stored_at = self._store(key, value)
+        return value, {"stale": False, "cached_at": stored_at}
+
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], is_failure: FailurePredicate):
+        if key in self._revalidating:
+            return
+        self._probe_in_flight = True
+
+        async def run():
+            try:
+                await self._attempt(key, fetch, probe=True, is_failure=is_failure)
+            except Exception:
+                pass
+            finally:
+                self._revalidating.pop(key, None)
+
+        self._revalidating[key] = asyncio.create_task(run())
+
+    async def call(self, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                   is_failure: FailurePredicate = _always_failure) -> tuple[Any, dict]:
+        """
+        Run fetch() through the breaker.
+        Returns (value, {"stale": bool, "cached_at": iso timestamp}).
+        Raises UpstreamUnavailable when open with nothing cached for key;
+        re-raises the upstream error when closed with nothing cached.
+        Exceptions for which is_failure(e) is False (caller errors) are
+        re-raised as-is and do not count against the upstream.
+        """
+        state = self._current_state()
+        if state == CLOSED:
+            try:
+                return await self._attempt(key, fetch, probe=False, is_failure=is_failure)
+            except Exception as e:
+                if not is_failure(e):
+                    raise
+                cached = self._cached(key)
+                if cached is None:
+                    raise
+                return self._stale(cached)
+
+        cached = self._cached(key)
+        if state == HALF_OPEN and not self._probe_in_flight:
+            if cached is None:
+                # Nothing to serve meanwhile — this request is the probe.
+                self._probe_in_flight = True
+                return await self._attempt(key, fetch, probe=True, is_failure=is_failure)
+            self._revalidate(key, fetch, is_failure)
+        if cached is None:
+            raise UpstreamUnavailable(
+                f"{self.name} is unavailable (circuit {self.state}); no cached result for this query"
+            )
+        return self._stale(cached)
+
+    def snapshot(self) -> dict:
+        """Read-only view of breaker state for /health — never mutates the breaker."""
+        now = time.monotonic()
+        state = self.state
+        if state == OPEN and now - self._opened_at >= self.reset_timeout:
+            state = HALF_OPEN
+        outcomes = [ok for ts, ok in list(self._outcomes) if now - ts <= self.window_seconds]
+        calls = len(outcomes)
+        failures = outcomes.count(False)
+        retry_in = None
+        if state == OPEN:
+            retry_in = round(max(0.0, self.reset_timeout - (now - self._opened_at)), 1)
+        return {
+            "state": state,
+            "calls_in_window": calls,
+            "error_rate": round(failures / calls, 2) if calls else 0.0,
+            "opened_at": self._opened_at_iso,
+            "retry_in_seconds": retry_in,
+            "last_error": self.last_error,
+            "cached_results": len(self._cache),
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Return the shared breaker for an upstream, creating it on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, **kwargs)
+    return _breakers[name]
+
+
+def breaker_states() -> dict:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
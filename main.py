@@ -15,6 +15,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from routers import research, trials, consensus, healthcare, denials
+from circuit_breaker import breaker_states
 
 load_dotenv()
 
@@ -40,8 +41,13 @@ app.include_router(denials.router, prefix="/api")
 
 
 @app.get("/health")
-def health():
-    return {"status": "healthy", "service": "sourcedmd-backend", "version": "1.0.0"}
+async def health():
+    return {
+        "status": "healthy",
+        "service": "sourcedmd-backend",
+        "version": "1.0.0",
+        "upstreams": breaker_states(),
+    }
 
 
 @app.get("/")
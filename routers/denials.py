@@ -5,20 +5,30 @@ Denial Appeal Engine
 3. Pulls lost cases as anti-patterns
 4. Combines with GRADE clinical evidence
 5. Generates bulletproof appeal letter
+
+Long denial letters are compacted with local extraction rules and precedents
+are deduplicated/ranked to a token budget before prompting. The model is asked
+for JSON; /denials/appeal/stream streams the letter as it is generated.
 """
 import os
 import urllib.request
 import json
 import asyncio
+import re
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from openai import AsyncOpenAI
 
+from circuit_breaker import get_breaker
+
 router = APIRouter()
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
 COURTLISTENER_TOKEN = os.getenv("COURTLISTENER_TOKEN", "")  # free tier works without token
 
+courtlistener_breaker = get_breaker("courtlistener", slow_call_seconds=15.0)
+
 
 class DenialRequest(BaseModel):
     denial_letter: str
@@ -35,45 +45,279 @@ def _court_headers():
     return h
 
 
-def fetch_cases(query: str, outcome: str = "won") -> list[dict]:
-    """Fetch real case law from CourtListener free API."""
-    search_q = f"{query} insurance denial appeal"
+def _search_courtlistener(search_q: str) -> list[dict]:
     url = f"https://www.courtlistener.com/api/rest/v4/search/?q={urllib.parse.quote(search_q)}&type=o&format=json&page_size=5"
+    req = urllib.request.Request(url, headers=_court_headers())
+    with urllib.request.urlopen(req, timeout=45) as r:
+        data = json.loads(r.read())
+    cases = []
+    for c in data.get("results", []):
+        cases.append({
+            "name": c.get("caseName", ""),
+            "court": c.get("court_id", ""),
+            "date": c.get("dateFiled", ""),
+            "url": f"https://www.courtlistener.com{c.get('absolute_url', '')}",
+            "snippet": c.get("snippet", "")[:300],
+        })
+    return cases
+
+
+async def fetch_cases(query: str, outcome: str = "won") -> tuple[list[dict], bool]:
+    """
+    Fetch real case law from CourtListener free API.
+    Returns (cases, stale) — stale is True when the circuit breaker served
+    a cached result because CourtListener is failing.
+    """
+    search_q = f"{query} insurance denial appeal"
     try:
-        req = urllib.request.Request(url, headers=_court_headers())
-        with urllib.request.urlopen(req, timeout=45) as r:
-            data = json.loads(r.read())
-        cases = []
-        for c in data.get("results", []):
-            cases.append({
-                "name": c.get("caseName", ""),
-                "court": c.get("court_id", ""),
-                "date": c.get("dateFiled", ""),
-                "url": f"https://www.courtlistener.com{c.get('absolute_url', '')}",
-                "snippet": c.get("snippet", "")[:300],
-            })
-        return cases
+        cases, freshness = await courtlistener_breaker.call(
+            search_q, lambda: asyncio.to_thread(_search_courtlistener, search_q)
+        )
+        return cases, freshness["stale"]
     except Exception as e:
-        return [{"error": str(e)}]
+        return [{"error": str(e)}], False
 
 
 import urllib.parse
 
 
-async def analyze_denial(client: AsyncOpenAI, denial_letter: str, condition: str,
-                          treatment: str, winning_cases: list, lost_cases: list,
-                          insurance_type: str) -> dict:
-    """Use DeepSeek to analyze denial and generate appeal."""
+# ── Prompt compaction ────────────────────────────────────────────────────
+# Long denial letters are mostly boilerplate (addresses, appeal-rights
+# notices, member services numbers). Local rules pull out the parts the
+# model actually needs so prompt size stays bounded.
+
+DENIAL_TOKEN_BUDGET = 700
+WINNING_TOKEN_BUDGET = 450
+LOST_TOKEN_BUDGET = 150
+
+# Shared by the blocking and streaming paths. The JSON object carries a full
+# formal letter plus four other keys (with escaping overhead), which regularly
+# overran 2000 tokens; deepseek-chat allows up to 8K output tokens.
+APPEAL_COMPLETION_ARGS = {
+    "model": "deepseek-chat",
+    "temperature": 0.3,
+    "max_tokens": 4096,
+    "response_format": {"type": "json_object"},
+}
+
+_SENTENCE_SPLIT = re.compile(
+    r"(?<!\bDr\.)(?<!\bMr\.)(?<!\bMs\.)(?<!\bMrs\.)(?<!\bSt\.)(?<!\bNo\.)(?<!\bvs\.)(?<!\be\.g\.)(?<!\bi\.e\.)"
+    r"(?<=[.!?])\s+|\n\s*\n"
+)
+# A reason needs a denial verb plus a cause, or an unambiguous coverage finding —
+# bare "denial"/"reason"/"criteria" also appear in appeal-rights boilerplate.
+_DENIAL_REASON = re.compile(
+    r"(?:\b(?:den(?:y|ied|ying)|not (?:be )?(?:covered|approved)|unable to (?:approve|cover)|"
+    r"cannot (?:be )?(?:approved|covered))\b[^.;]{0,200}?\b(?:because|due to|since|based on|per|under)\b"
+    r"|\bnot medically necessary\b|\b(?:does|do|did) not meet\b|\bexperimental\b|\binvestigational\b"
+    r"|\bnot a covered (?:benefit|service)\b|\b(?:is|are) excluded\b|\bexclusion\b|\bout[- ]of[- ]network\b"
+    r"|\b(?:without|no|lack of) prior (?:authorization|approval)\b|\binsufficient (?:clinical )?documentation\b)",
+    re.I,
+)
+_BOILERPLATE = re.compile(
+    r"\b(?:member services|customer service|call us|contact us|questions|TTY|toll[- ]free|appeal rights|"
+    r"right to (?:appeal|request|file)|you (?:may|can) (?:request|file|appeal|ask)|language assistance|"
+    r"interpreter|free of charge|discriminat\w*)\b|\b1-8\d\d-|^(?:dear|sincerely|regards)\b",
+    re.I,
+)
+_POLICY_CITATION = re.compile(
+    r"(§|\b(?:polic(?:y|ies)|bulletin|guideline|section\s+\d|\d+\s*C\.?F\.?R|U\.?S\.?C|ERISA|"
+    r"plan document|certificate of coverage|evidence of coverage|InterQual|MCG|LCD|NCD)\b)",
+    re.I,
+)
+_DATE = re.compile(
+    r"\b(?:\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}|"
+    r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})\b"
+)
+_CODE_CONTEXT = re.compile(r"\b(?:CPT|HCPCS|ICD(?:-10)?|code|diagnosis|procedure)\b", re.I)
+_CODE = re.compile(r"\b(?:[A-TV-Z]\d[0-9A-Z](?:\.[0-9A-Z]{1,4})?|\d{4}[0-9FTU]|[A-V]\d{4})\b")
+# Sentences that spell out the reason just stated ("Specifically, there is no
+# documentation of ...") — kept attached to the reason they follow.
+_ELABORATION = re.compile(
+    r"^(?:specifically|in particular|namely|for example|this is because|because|"
+    r"there (?:is|was) no|no documentation|the (?:submitted |medical )?(?:records?|documentation))\b",
+    re.I,
+)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[a-z0-9]{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) — good enough for budgeting."""
+    return len(text) // 4 + 1
 
-    winning_summary = "\n".join([f"- {c['name']} ({c['court']}, {c['date']}): {c.get('snippet','')[:150]}"
-                                  for c in winning_cases if "error" not in c])
-    lost_summary = "\n".join([f"- {c['name']} ({c['court']}, {c['date']})"
-                               for c in lost_cases if "error" not in c])
+
+def _dedupe(items: list[str]) -> list[str]:
+    seen = set()
+    out = []
+    for item in items:
+        key = item.lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(item)
+    return out
+
+
+def _ranked(scored: list[tuple[int, str]]) -> list[str]:
+    """Highest score first; document order breaks ties."""
+    ordered = sorted(enumerate(scored), key=lambda item: (-item[1][0], item[0]))
+    return _dedupe([sentence for _, (score, sentence) in ordered if score > 0])
+
+
+def extract_denial_sections(denial_letter: str) -> dict:
+    """
+    Rule-based extraction of the parts of a denial letter that matter for an appeal:
+    denial reasons, policy citations, dates and diagnosis/procedure codes.
+    Reasons and citations are ranked most relevant first; boilerplate sentences
+    (member services, appeal-rights notices) are dropped. "context" holds the
+    remaining substantive sentences — neighbours of reasons first, then the
+    rest in document order — to fill whatever budget is left.
+    """
+    sentences = [" ".join(s.split()) for s in _SENTENCE_SPLIT.split(denial_letter)]
+    sentences = [s for s in sentences if s]
+    substantive = [s for s in sentences if not _BOILERPLATE.search(s)]
+
+    reasons = []
+    citations = []
+    attached = set()
+    neighbours = []
+    for i, s in enumerate(substantive):
+        reason_hits = len(_DENIAL_REASON.findall(s))
+        policy_hits = len(_POLICY_CITATION.findall(s))
+        has_codes = bool(_CODE_CONTEXT.search(s) and _CODE.search(s))
+        if reason_hits:
+            nxt = substantive[i + 1] if i + 1 < len(substantive) else ""
+            reason = s
+            if nxt and _ELABORATION.match(nxt) and not _DENIAL_REASON.search(nxt):
+                reason = f"{s} {nxt}"
+                attached.add(nxt)
+            reasons.append((2 * reason_hits + min(policy_hits, 1) + has_codes, reason))
+            if i > 0:
+                neighbours.append(substantive[i - 1])
+            if nxt:
+                neighbours.append(nxt)
+        if policy_hits:
+            citations.append((policy_hits + min(reason_hits, 1), s))
+
+    context = [s for s in _dedupe(neighbours + substantive) if s not in attached]
+
+    dates = [m.group(0) for m in _DATE.finditer(denial_letter)]
+    codes = [c for s in sentences if _CODE_CONTEXT.search(s) for c in _CODE.findall(s)]
+
+    return {
+        "denial_reasons": _ranked(reasons),
+        "policy_citations": _ranked(citations),
+        "context": context,
+        "dates": _dedupe(dates),
+        "codes": _dedupe(codes),
+    }
+
+
+def _fit_to_budget(sentences: list[str], budget_tokens: int, skip: set) -> tuple[list[str], int]:
+    kept = []
+    used = 0
+    for sentence in sentences:
+        if any(sentence in done for done in skip):
+            continue  # already emitted, possibly as part of a reason + elaboration
+        line = f"- {sentence[:600]}"
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            continue  # a shorter, lower-ranked sentence may still fit
+        kept.append(line)
+        skip.add(sentence)
+        used += cost
+    return kept, used
+
+
+def compact_denial(denial_letter: str, sections: dict, budget_tokens: int = DENIAL_TOKEN_BUDGET) -> str:
+    """Return the letter verbatim if it fits the budget, otherwise its extracted sections."""
+    if estimate_tokens(denial_letter) <= budget_tokens:
+        return denial_letter.strip()
+
+    lines = []
+    if sections["dates"]:
+        lines.append(f"Dates: {', '.join(sections['dates'][:6])}")
+    if sections["codes"]:
+        lines.append(f"Codes: {', '.join(sections['codes'][:10])}")
+    remaining = budget_tokens - sum(estimate_tokens(l) for l in lines)
+
+    # Reasons get most of the budget; citations keep their own share plus
+    # whatever reasons leave unused.
+    emitted = set()
+    reason_lines, used = _fit_to_budget(sections["denial_reasons"], int(remaining * 0.6), emitted)
+    remaining -= used
+    citation_lines, used = _fit_to_budget(sections["policy_citations"], remaining, emitted)
+    remaining -= used
+    # Leftover budget goes to the other substantive sentences, so what the
+    # denial is about (drug, service, clinical history) is not lost.
+    context_lines, used = _fit_to_budget(sections["context"], remaining, emitted)
+    remaining -= used
+
+    if reason_lines:
+        lines.append("Denial reasons:")
+        lines.extend(reason_lines)
+    if citation_lines:
+        lines.append("Policy citations:")
+        lines.extend(citation_lines)
+    if context_lines:
+        lines.append("Other details:")
+        lines.extend(context_lines)
+    return "\n".join(lines)
+
+
+def rank_precedents(cases: list[dict], query: str, budget_tokens: int,
+                    exclude: set | None = None, with_snippet: bool = True) -> list[str]:
+    """
+    Deduplicate cases, rank them by term overlap with the query (newer first on ties)
+    and return prompt lines until the token budget is spent.
+    """
+    terms = set(_WORD.findall(query.lower()))
+    exclude = exclude or set()
+    seen = set()
+    scored = []
+    for c in cases:
+        if "error" in c:
+            continue
+        key = c.get("url") or " ".join(_WORD.findall(c.get("name", "").lower()))
+        if key in seen or key in exclude:
+            continue
+        seen.add(key)
+        snippet = " ".join(_HTML_TAG.sub("", c.get("snippet", "")).split())
+        overlap = len(terms & set(_WORD.findall(f"{c.get('name', '')} {snippet}".lower())))
+        scored.append((overlap, c.get("date", ""), c, snippet))
+
+    scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+
+    lines = []
+    used = 0
+    for _, _, c, snippet in scored:
+        line = f"- {c['name']} ({c['court']}, {c['date']})"
+        if with_snippet and snippet:
+            line += f": {snippet[:150]}"
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+
+def build_appeal_prompt(denial_letter: str, condition: str, treatment: str,
+                        winning_cases: list, lost_cases: list, insurance_type: str) -> tuple[str, dict]:
+    """Build the compacted appeal prompt. Returns (prompt, extracted denial sections)."""
+    sections = extract_denial_sections(denial_letter)
+    denial_text = compact_denial(denial_letter, sections)
+
+    query = " ".join([condition, treatment, *sections["denial_reasons"][:3]])
+    winning_keys = {c.get("url") for c in winning_cases if "error" not in c}
+    winning_summary = "\n".join(rank_precedents(winning_cases, query, WINNING_TOKEN_BUDGET))
+    lost_summary = "\n".join(rank_precedents(lost_cases, query, LOST_TOKEN_BUDGET,
+                                             exclude=winning_keys, with_snippet=False))
 
     prompt = f"""You are a medical appeals attorney. Analyze this insurance denial and generate a formal appeal letter.
 
-DENIAL LETTER:
-{denial_letter}
+DENIAL LETTER (key sections):
+{denial_text}
 
 CONDITION: {condition}
 TREATMENT: {treatment}
@@ -85,32 +329,182 @@ WINNING CASE PRECEDENTS (use these to support the appeal):
 ANTI-PATTERNS FROM LOST CASES (avoid these mistakes):
 {lost_summary or 'None identified'}
 
-Generate:
-1. DENIAL_TYPE: What type of denial is this (medical necessity, experimental, out-of-network, prior auth)?
-2. LEGAL_BASIS: Which laws/regulations were violated (ACA, ERISA, state law, Mental Health Parity)?
-3. APPEAL_LETTER: Complete formal appeal letter with case citations
-4. ANTI_PATTERNS_AVOIDED: List of mistakes this appeal avoids based on lost cases
-5. WIN_PROBABILITY: LOW/MEDIUM/HIGH based on precedent
+Respond with a single JSON object with exactly these keys, in this order:
+{{
+  "denial_type": "medical necessity | experimental | out-of-network | prior auth | other",
+  "legal_basis": ["laws/regulations violated (ACA, ERISA, state law, Mental Health Parity)"],
+  "appeal_letter": "complete formal appeal letter with case citations",
+  "anti_patterns_avoided": ["mistakes this appeal avoids based on lost cases"],
+  "win_probability": "LOW | MEDIUM | HIGH based on precedent"
+}}"""
+    return prompt, sections
 
-Format as JSON."""
+
+def _parse_appeal(text: str, streamed_letter: str = "", finish_reason: str | None = None) -> dict:
+    result = None
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            result = parsed
+    except Exception:
+        pass
+    if result is None:
+        result = {"appeal_letter": streamed_letter or text}
+    if finish_reason == "length":
+        # Output hit max_tokens — the letter (and any keys after it) is incomplete.
+        result["truncated"] = True
+    return result
+
+
+class _JsonStringFieldStream:
+    """
+    Incrementally decodes one string field out of a JSON object as it streams in,
+    so the appeal letter can be forwarded before the full object is parseable.
+    """
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self._opening = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self.started = False
+        self.done = False
+        self.value = ""
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self._buffer += chunk
+        if not self.started:
+            m = self._opening.search(self._buffer)
+            if not m:
+                return ""
+            self.started = True
+            self._pos = m.end()
+
+        out = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break  # escape split across chunks
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    code = int(buf[i + 2:i + 6], 16)
+                except ValueError:
+                    i += 6
+                    continue
+                if 0xD800 <= code <= 0xDBFF:
+                    # High surrogate — pair it with a following \uDCxx escape.
+                    nxt = buf[i + 6:i + 12]
+                    if len(nxt) < 6 and "\\u".startswith(nxt[:2]):
+                        break  # low half may still be on its way
+                    if nxt[:2] == "\\u":
+                        try:
+                            low = int(nxt[2:], 16)
+                        except ValueError:
+                            low = 0
+                        if 0xDC00 <= low <= 0xDFFF:
+                            out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                            i += 12
+                            continue
+                out.append(chr(code))
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        text = "".join(out)
+        self.value += text
+        return text
+
+
+async def analyze_denial(client: AsyncOpenAI, denial_letter: str, condition: str,
+                          treatment: str, winning_cases: list, lost_cases: list,
+                          insurance_type: str) -> dict:
+    """Use DeepSeek to analyze denial and generate appeal."""
+    prompt, _ = build_appeal_prompt(denial_letter, condition, treatment,
+                                    winning_cases, lost_cases, insurance_type)
 
     response = await client.chat.completions.create(
-        model="deepseek-chat",
         messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_tokens=2000,
+        **APPEAL_COMPLETION_ARGS,
+    )
+    choice = response.choices[0]
+    text = choice.message.content or ""
+    # Pull the letter out of the (possibly truncated) JSON, so a parse failure
+    # falls back to clean letter text rather than the raw JSON fragment.
+    letter = _JsonStringFieldStream("appeal_letter")
+    letter.feed(text)
+    return _parse_appeal(text, letter.value, choice.finish_reason)
+
+
+async def stream_denial_analysis(client: AsyncOpenAI, prompt: str):
+    """
+    Stream the appeal generation.
+    Yields ("letter_delta", text) while the appeal letter is being written,
+    then a single ("result", dict) with all parsed JSON fields.
+    """
+    stream = await client.chat.completions.create(
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        **APPEAL_COMPLETION_ARGS,
     )
 
+    letter = _JsonStringFieldStream("appeal_letter")
+    parts = []
+    finish_reason = None
     try:
-        text = response.choices[0].message.content
-        # Extract JSON if wrapped in markdown
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-        return json.loads(text)
-    except Exception:
-        return {"appeal_letter": response.choices[0].message.content}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            parts.append(delta)
+            text = letter.feed(delta)
+            if text:
+                yield "letter_delta", text
+    finally:
+        # Client disconnects cancel this generator — release the upstream
+        # request now instead of leaving generation running until GC.
+        await stream.close()
+
+    yield "result", _parse_appeal("".join(parts), letter.value, finish_reason)
+
+
+async def _gather_precedents(request: DenialRequest):
+    # Parallel: fetch winning cases + anti-pattern cases
+    search_term = f"{request.condition} {request.treatment} medical necessity"
+
+    (winning_cases, winning_stale), (lost_cases, lost_stale) = await asyncio.gather(
+        fetch_cases(search_term, "won"),
+        fetch_cases(f"{search_term} denied upheld", "lost"),
+    )
+    return winning_cases, lost_cases, winning_stale or lost_stale
+
+
+def _missing_key_response(winning_cases: list, lost_cases: list, precedents_stale: bool) -> dict:
+    return {
+        "error": "DEEPSEEK_API_KEY not configured",
+        "winning_cases_found": len(winning_cases),
+        "lost_cases_found": len(lost_cases),
+        "cases_preview": winning_cases[:2],
+        "precedents_stale": precedents_stale,
+    }
 
 
 @router.post("/denials/appeal")
@@ -119,21 +513,10 @@ async def generate_appeal(request: DenialRequest):
     Generate evidence-backed insurance denial appeal.
     Combines real case law (won + lost) with clinical evidence.
     """
-    # Parallel: fetch winning cases + anti-pattern cases
-    search_term = f"{request.condition} {request.treatment} medical necessity"
-
-    winning_cases, lost_cases = await asyncio.gather(
-        asyncio.to_thread(fetch_cases, search_term, "won"),
-        asyncio.to_thread(fetch_cases, f"{search_term} denied upheld", "lost"),
-    )
+    winning_cases, lost_cases, precedents_stale = await _gather_precedents(request)
 
     if not DEEPSEEK_API_KEY:
-        return {
-            "error": "DEEPSEEK_API_KEY not configured",
-            "winning_cases_found": len(winning_cases),
-            "lost_cases_found": len(lost_cases),
-            "cases_preview": winning_cases[:2],
-        }
+        return _missing_key_response(winning_cases, lost_cases, precedents_stale)
 
     client = AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
 
@@ -152,5 +535,59 @@ async def generate_appeal(request: DenialRequest):
         "treatment": request.treatment,
         "winning_precedents": winning_cases,
         "anti_patterns": lost_cases,
+        "precedents_stale": precedents_stale,
         "appeal": result,
     }
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+@router.post("/denials/appeal/stream")
+async def stream_appeal(request: DenialRequest):
+    """
+    Streaming variant of /denials/appeal (newline-delimited JSON).
+    Events: "precedents" first, then "letter_delta" chunks of the appeal letter
+    as it is generated, then "result" with the parsed JSON fields.
+    Any failure is reported as a single "error" event.
+    """
+    async def events():
+        try:
+            # Precedent search (two CourtListener lookups) runs inside the stream
+            # so the response opens immediately and failures become error events.
+            winning_cases, lost_cases, precedents_stale = await _gather_precedents(request)
+
+            if not DEEPSEEK_API_KEY:
+                missing = _missing_key_response(winning_cases, lost_cases, precedents_stale)
+                yield _ndjson({"type": "error", "detail": missing.pop("error"), **missing})
+                return
+
+            client = AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
+            prompt, sections = build_appeal_prompt(
+                request.denial_letter,
+                request.condition,
+                request.treatment,
+                winning_cases,
+                lost_cases,
+                request.insurance_type,
+            )
+
+            yield _ndjson({
+                "type": "precedents",
+                "condition": request.condition,
+                "treatment": request.treatment,
+                "denial_sections": sections,
+                "winning_precedents": winning_cases,
+                "anti_patterns": lost_cases,
+                "precedents_stale": precedents_stale,
+            })
+            async for kind, payload in stream_denial_analysis(client, prompt):
+                if kind == "letter_delta":
+                    yield _ndjson({"type": "letter_delta", "text": payload})
+                else:
+                    yield _ndjson({"type": "result", "appeal": payload})
+        except Exception as e:
+            yield _ndjson({"type": "error", "detail": f"Appeal generation failed: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
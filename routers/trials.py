@@ -1,15 +1,76 @@
 """
 ClinicalTrials.gov search endpoint.
 Uses free public API — no key required.
+Calls go through a circuit breaker; while ClinicalTrials.gov is down the
+last good result for the same search is served with "stale": true.
 """
 import httpx
 from fastapi import APIRouter, HTTPException
 from typing import Optional
 
+from circuit_breaker import get_breaker, UpstreamUnavailable
+
 router = APIRouter()
 
 TRIALS_API_URL = "https://clinicaltrials.gov/api/v2/studies"
 
+trials_breaker = get_breaker("clinicaltrials_gov", slow_call_seconds=10.0)
+
+
+def _is_client_error(e: Exception) -> bool:
+    """4xx (other than 429) means ClinicalTrials.gov rejected our query params, not that it is down."""
+    if not isinstance(e, httpx.HTTPStatusError):
+        return False
+    code = e.response.status_code
+    return 400 <= code < 500 and code != 429
+
+
+def _is_upstream_failure(e: Exception) -> bool:
+    return not _is_client_error(e)
+
+
+async def _fetch_trials(params: dict) -> list[dict]:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        resp = await client.get(TRIALS_API_URL, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+
+    studies = data.get("studies", [])
+    results = []
+    for study in studies:
+        proto = study.get("protocolSection", {})
+        id_module = proto.get("identificationModule", {})
+        status_module = proto.get("statusModule", {})
+        design_module = proto.get("designModule", {})
+        conditions_module = proto.get("conditionsModule", {})
+        interventions_module = proto.get("armsInterventionsModule", {})
+        locations_module = proto.get("contactsLocationsModule", {})
+
+        locations = locations_module.get("locations", [])
+        loc_summaries = [
+            f"{l.get('facility', '')} — {l.get('city', '')}, {l.get('country', '')}"
+            for l in locations[:3]
+        ]
+
+        interventions = interventions_module.get("interventions", [])
+        intervention_names = [i.get("name", "") for i in interventions[:3]]
+
+        results.append({
+            "nct_id": id_module.get("nctId", ""),
+            "title": id_module.get("briefTitle", ""),
+            "status": status_module.get("overallStatus", ""),
+            "phase": design_module.get("phases", []),
+            "study_type": design_module.get("studyType", ""),
+            "conditions": conditions_module.get("conditions", []),
+            "interventions": intervention_names,
+            "locations": loc_summaries,
+            "enrollment": design_module.get("enrollmentInfo", {}).get("count", None),
+            "start_date": status_module.get("startDateStruct", {}).get("date", ""),
+            "completion_date": status_module.get("primaryCompletionDateStruct", {}).get("date", ""),
+            "url": f"https://clinicaltrials.gov/study/{id_module.get('nctId', '')}",
+        })
+    return results
+
 
 @router.get("/clinical-trials/search")
 async def search_trials(
@@ -32,51 +93,28 @@ async def search_trials(
         if phase:
             params["filter.phase"] = phase
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(TRIALS_API_URL, params=params)
-            data = resp.json()
-
-        studies = data.get("studies", [])
-        results = []
-        for study in studies:
-            proto = study.get("protocolSection", {})
-            id_module = proto.get("identificationModule", {})
-            status_module = proto.get("statusModule", {})
-            design_module = proto.get("designModule", {})
-            conditions_module = proto.get("conditionsModule", {})
-            interventions_module = proto.get("armsInterventionsModule", {})
-            locations_module = proto.get("contactsLocationsModule", {})
-
-            locations = locations_module.get("locations", [])
-            loc_summaries = [
-                f"{l.get('facility', '')} — {l.get('city', '')}, {l.get('country', '')}"
-                for l in locations[:3]
-            ]
-
-            interventions = interventions_module.get("interventions", [])
-            intervention_names = [i.get("name", "") for i in interventions[:3]]
-
-            results.append({
-                "nct_id": id_module.get("nctId", ""),
-                "title": id_module.get("briefTitle", ""),
-                "status": status_module.get("overallStatus", ""),
-                "phase": design_module.get("phases", []),
-                "study_type": design_module.get("studyType", ""),
-                "conditions": conditions_module.get("conditions", []),
-                "interventions": intervention_names,
-                "locations": loc_summaries,
-                "enrollment": design_module.get("enrollmentInfo", {}).get("count", None),
-                "start_date": status_module.get("startDateStruct", {}).get("date", ""),
-                "completion_date": status_module.get("primaryCompletionDateStruct", {}).get("date", ""),
-                "url": f"https://clinicaltrials.gov/study/{id_module.get('nctId', '')}",
-            })
+        cache_key = tuple(sorted(params.items()))
+        results, freshness = await trials_breaker.call(
+            cache_key, lambda: _fetch_trials(params), is_failure=_is_upstream_failure
+        )
 
         return {
             "condition": condition,
             "status_filter": status,
             "total": len(results),
             "results": results,
+            "stale": freshness["stale"],
+            "cached_at": freshness["cached_at"],
         }
 
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.HTTPStatusError as e:
+        if _is_client_error(e):
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"ClinicalTrials.gov rejected the search parameters: {e.response.text[:300]}",
+            )
+        raise HTTPException(status_code=500, detail=f"ClinicalTrials.gov search failed: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"ClinicalTrials.gov search failed: {str(e)}")